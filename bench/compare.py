@@ -0,0 +1,71 @@
+"""
+Compare two bench.run result files and flag regressions:
+
+    python -m bench.compare results/base.json results/head.json \
+        --threshold 10
+
+Exits with status 1 when any scenario's p95/p99 latency grew, or its
+throughput dropped, by more than the threshold percentage.
+"""
+import sys
+import json
+import argparse
+
+LATENCY_KEYS = ('p50_ms', 'p95_ms', 'p99_ms')
+GATED_KEYS = ('p95_ms', 'p99_ms')
+
+
+def _load(path: str) -> dict:
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def _change(base: float, head: float) -> float:
+    return (head - base) / base * 100 if base else 0.0
+
+
+def compare(base: dict, head: dict, threshold: float) -> list[str]:
+    regressions = []
+    print(f"base {base.get('commit')}  head {head.get('commit')}")
+    print(f"{'scenario':<24}{'metric':<16}{'base':>10}{'head':>10}"
+          f"{'change':>10}")
+    for name, head_stats in head['scenarios'].items():
+        base_stats = base['scenarios'].get(name)
+        if base_stats is None:
+            continue
+        for key in LATENCY_KEYS + ('throughput_rps',):
+            change = _change(base_stats[key], head_stats[key])
+            print(f"{name:<24}{key:<16}{base_stats[key]:>10.1f}"
+                  f"{head_stats[key]:>10.1f}{change:>+9.1f}%")
+            worse = change > threshold if key in GATED_KEYS \
+                else key == 'throughput_rps' and change < -threshold
+            if worse:
+                regressions.append(f"{name} {key} {change:+.1f}%")
+
+    base_cpu = base.get('server_cpu_ms_per_request')
+    head_cpu = head.get('server_cpu_ms_per_request')
+    if base_cpu and head_cpu:
+        change = _change(base_cpu, head_cpu)
+        print(f"{'all':<24}{'cpu_ms/request':<16}{base_cpu:>10.2f}"
+              f"{head_cpu:>10.2f}{change:>+9.1f}%")
+        if change > threshold:
+            regressions.append(f"cpu_ms/request {change:+.1f}%")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare benchmark runs.')
+    parser.add_argument('base')
+    parser.add_argument('head')
+    parser.add_argument('--threshold', type=float, default=10,
+                        help='allowed regression in percent')
+    args = parser.parse_args(argv)
+
+    regressions = compare(_load(args.base), _load(args.head), args.threshold)
+    if regressions:
+        print('\nRegressions:\n  ' + '\n  '.join(regressions))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
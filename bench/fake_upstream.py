@@ -0,0 +1,141 @@
+"""
+Fake model API for benchmarks.
+
+Serves OpenAI-shaped chat completions (plain JSON or SSE when the payload
+asks for "stream": true) and embeddings with configurable latency, jitter
+and injected failures:
+
+    python -m bench.fake_upstream --port 9000 --latency-ms 300 \
+        --jitter-ms 50 --error-rate 0.01 --hang-rate 0.001
+"""
+import json
+import time
+import random
+import asyncio
+import argparse
+
+from aiohttp import web
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--latency-ms', type=float, default=200,
+                        help='time to the full response (or first chunk)')
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--chunk-ms', type=float, default=20,
+                        help='delay between streamed chunks')
+    parser.add_argument('--chunks', type=int, default=20,
+                        help='chunks per streamed completion')
+    parser.add_argument('--error-rate', type=float, default=0,
+                        help='fraction of calls answered with HTTP 500')
+    parser.add_argument('--hang-rate', type=float, default=0,
+                        help='fraction of calls that never answer')
+    parser.add_argument('--embedding-dim', type=int, default=1536)
+    return parser.parse_args(argv)
+
+
+class FakeUpstream():
+    def __init__(self, config):
+        self.config = config
+        self.calls = 0
+
+    async def _delay(self):
+        jitter = random.uniform(-1, 1) * self.config.jitter_ms
+        await asyncio.sleep(max(0, self.config.latency_ms + jitter) / 1000)
+
+    async def _inject_failure(self) -> web.Response | None:
+        roll = random.random()
+        if roll < self.config.hang_rate:
+            await asyncio.sleep(3600)
+        if roll < self.config.hang_rate + self.config.error_rate:
+            return web.json_response(
+                {'error': {'message': 'Injected failure',
+                           'type': 'server_error'}},
+                status=500
+            )
+        return None
+
+    async def chat_completions(self, request: web.Request):
+        self.calls += 1
+        body = await request.json()
+        await self._delay()
+        failure = await self._inject_failure()
+        if failure is not None:
+            return failure
+
+        completion_id = f"chatcmpl-{self.calls}"
+        model = body.get('model', 'fake-model')
+        if not body.get('stream'):
+            return web.json_response({
+                'id': completion_id,
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant',
+                                'content': 'lorem ' * self.config.chunks},
+                    'finish_reason': 'stop',
+                }],
+                'usage': {'prompt_tokens': len(body.get('messages', [])),
+                          'completion_tokens': self.config.chunks,
+                          'total_tokens': self.config.chunks},
+            })
+
+        resp = web.StreamResponse(
+            headers={'Content-Type': 'text/event-stream'}
+        )
+        await resp.prepare(request)
+        for i in range(self.config.chunks):
+            chunk = {
+                'id': completion_id,
+                'object': 'chat.completion.chunk',
+                'model': model,
+                'choices': [{'index': 0, 'delta': {'content': 'lorem '},
+                             'finish_reason': None}],
+            }
+            await resp.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            await asyncio.sleep(self.config.chunk_ms / 1000)
+        await resp.write(b"data: [DONE]\n\n")
+        await resp.write_eof()
+        return resp
+
+    async def embeddings(self, request: web.Request):
+        self.calls += 1
+        body = await request.json()
+        await self._delay()
+        failure = await self._inject_failure()
+        if failure is not None:
+            return failure
+
+        texts = body.get('input', [])
+        if isinstance(texts, str):
+            texts = [texts]
+        dim = self.config.embedding_dim
+        return web.json_response({
+            'object': 'list',
+            'model': body.get('model', 'fake-embedding'),
+            'data': [{'object': 'embedding', 'index': i,
+                      'embedding': [random.random() for _ in range(dim)]}
+                     for i in range(len(texts))],
+        })
+
+
+def make_app(config) -> web.Application:
+    upstream = FakeUpstream(config)
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_post('/v1/chat/completions', upstream.chat_completions)
+    app.router.add_post('/v1/embeddings', upstream.embeddings)
+    return app
+
+
+def main(argv=None):
+    config = _parse_args(argv)
+    web.run_app(make_app(config), host=config.host, port=config.port,
+                print=None)
+
+
+if __name__ == '__main__':
+    main()
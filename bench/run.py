@@ -0,0 +1,446 @@
+"""
+Load and latency benchmark for the Tevye GPT server.
+
+Closed loop, 32 workers for 60s against a running server:
+
+    python -m bench.run --base-url http://127.0.0.1:8080 \
+        --mix login=1,refresh=1,gateway=8 --concurrency 32 --duration 60
+
+Open loop at 200 req/s, starting the app and a fake upstream locally (DB_DSN
+must point at a local Postgres, e.g.
+`docker run -d -p 5432:5432 -e POSTGRES_PASSWORD=postgres postgres:16`):
+
+    python -m bench.run --start-stack --init-db --rate 200 --duration 60 \
+        --upstream-args "--latency-ms 300 --error-rate 0.01" \
+        --out results/$(git rev-parse --short HEAD).json
+
+Replay of traffic recorded with TRAFFIC_RECORD_PATH, twice as fast:
+
+    python -m bench.run --start-stack --replay traffic.jsonl --speed 2
+
+Results are written as JSON and can be compared with bench.compare.
+"""
+import os
+import sys
+import json
+import time
+import shlex
+import random
+import asyncio
+import argparse
+import platform
+import subprocess
+
+import aiohttp
+
+SCENARIOS = ('login', 'refresh', 'gateway')
+PASSWORD = 'BenchPassw0rd'
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark /auth/login, /auth/refresh and '
+                    '/gateway/services.'
+    )
+    parser.add_argument('--base-url', default='http://127.0.0.1:8080')
+    parser.add_argument('--start-stack', action='store_true',
+                        help='start the app and a fake upstream locally')
+    parser.add_argument('--app-port', type=int, default=8080)
+    parser.add_argument('--upstream-port', type=int, default=9000)
+    parser.add_argument('--upstream-args', default='',
+                        help='extra arguments for bench.fake_upstream')
+    parser.add_argument('--init-db', action='store_true',
+                        help='create the schema in DB_DSN before running')
+    parser.add_argument('--server-pid', type=int,
+                        help='pid of an already running server, for CPU '
+                             'accounting')
+    parser.add_argument('--users', type=int, default=64,
+                        help='virtual users, each running one request at '
+                             'a time')
+    parser.add_argument('--mix', default='login=1,refresh=1,gateway=8',
+                        help='scenario weights, e.g. gateway=8,login=1')
+    parser.add_argument('--concurrency', type=int, default=16,
+                        help='closed-loop workers (ignored with --rate)')
+    parser.add_argument('--rate', type=float,
+                        help='open-loop arrival rate in requests/s')
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--warmup', type=float, default=5)
+    parser.add_argument('--messages', type=int, default=10,
+                        help='chat history length per gateway call')
+    parser.add_argument('--message-chars', type=int, default=400)
+    parser.add_argument('--service', default='chat_completion')
+    parser.add_argument('--replay', help='JSONL file to replay')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='replay speed multiplier')
+    parser.add_argument('--out', help='write results to this JSON file')
+    return parser.parse_args(argv)
+
+
+def _parse_mix(raw: str) -> list[tuple[str, float]]:
+    mix = []
+    for part in raw.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {name!r}")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float | None:
+    if not sorted_values:
+        return None
+    rank = max(0, int(round(pct / 100 * len(sorted_values))) - 1)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def _cpu_seconds(pid: int | None) -> float | None:
+    if pid is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/stat") as fh:
+            fields = fh.read().rsplit(')', 1)[1].split()
+    except OSError:
+        return None
+    # utime and stime are fields 14 and 15 of /proc/<pid>/stat.
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+            text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Recorder():
+    def __init__(self):
+        self.samples: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+        self.statuses: dict[str, dict[str, int]] = {}
+        self.recording = False
+
+    def add(self, scenario: str, latency: float, status: int | str):
+        if not self.recording:
+            return
+        self.samples.setdefault(scenario, []).append(latency)
+        statuses = self.statuses.setdefault(scenario, {})
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        if status != 200:
+            self.errors[scenario] = self.errors.get(scenario, 0) + 1
+
+    def summary(self, elapsed: float) -> dict:
+        result = {}
+        for scenario, samples in sorted(self.samples.items()):
+            samples = sorted(samples)
+            result[scenario] = {
+                'count': len(samples),
+                'errors': self.errors.get(scenario, 0),
+                'statuses': self.statuses.get(scenario, {}),
+                'throughput_rps': len(samples) / elapsed,
+                'mean_ms': sum(samples) / len(samples) * 1000,
+                'p50_ms': _percentile(samples, 50) * 1000,
+                'p95_ms': _percentile(samples, 95) * 1000,
+                'p99_ms': _percentile(samples, 99) * 1000,
+                'max_ms': samples[-1] * 1000,
+            }
+        return result
+
+
+class BenchUser():
+    def __init__(self, email: str):
+        self.email = email
+        self.access: str | None = None
+        self.refresh: str | None = None
+
+
+class Client():
+    def __init__(self, session: aiohttp.ClientSession, base_url: str,
+                 args, recorder: Recorder):
+        self.session = session
+        self.base_url = base_url.rstrip('/')
+        self.args = args
+        self.recorder = recorder
+        self.users: asyncio.Queue[BenchUser] = asyncio.Queue()
+
+    async def setup_users(self, count: int):
+        run_id = f"{int(time.time())}{random.randint(0, 9999):04d}"
+        for i in range(count):
+            user = BenchUser(f"bench-{run_id}-{i}@example.com")
+            async with self.session.post(
+                f"{self.base_url}/auth/register",
+                json={'email': user.email, 'password': PASSWORD,
+                      'tenant_name': f"bench-tenant-{i % 4}"}
+            ) as resp:
+                if resp.status not in (201, 409):
+                    raise SystemExit(
+                        f"Register failed: {resp.status} {await resp.text()}"
+                    )
+            await self._login(user)
+            self.users.put_nowait(user)
+
+    def _store_tokens(self, user: BenchUser, resp, body: dict):
+        user.access = body['access_token']
+        # The refresh cookie is marked Secure, so it is read by hand instead
+        # of relying on the cookie jar over plain http.
+        cookie = resp.cookies.get('refresh_token')
+        if cookie is not None:
+            user.refresh = cookie.value
+
+    async def _login(self, user: BenchUser) -> int:
+        async with self.session.post(
+            f"{self.base_url}/auth/login",
+            json={'email': user.email, 'password': PASSWORD}
+        ) as resp:
+            body = await resp.json(content_type=None)
+            if resp.status == 200:
+                self._store_tokens(user, resp, body)
+            return resp.status
+
+    async def _refresh(self, user: BenchUser) -> int:
+        async with self.session.post(
+            f"{self.base_url}/auth/refresh",
+            headers={'Cookie': f"refresh_token={user.refresh}"}
+        ) as resp:
+            body = await resp.json(content_type=None)
+            if resp.status == 200:
+                self._store_tokens(user, resp, body)
+            return resp.status
+
+    def _chat_payload(self) -> dict:
+        messages = [
+            {'role': 'user' if i % 2 == 0 else 'assistant',
+             'content': 'x' * self.args.message_chars}
+            for i in range(self.args.messages)
+        ]
+        return {'model': 'bench-model', 'messages': messages}
+
+    async def _gateway(self, user: BenchUser, service: str, payload: dict,
+                       priority: str = 'interactive') -> int:
+        async with self.session.post(
+            f"{self.base_url}/gateway/services",
+            headers={'Authorization': f"Bearer {user.access}"},
+            json={'service': service, 'payload': payload,
+                  'priority': priority}
+        ) as resp:
+            await resp.read()
+            return resp.status
+
+    async def run_one(self, scenario: str, scheduled: float,
+                      call=None):
+        user = await self.users.get()
+        try:
+            try:
+                if call is not None:
+                    status = await call(user)
+                elif scenario == 'login':
+                    status = await self._login(user)
+                elif scenario == 'refresh':
+                    status = await self._refresh(user)
+                else:
+                    status = await self._gateway(user, self.args.service,
+                                                 self._chat_payload())
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status = type(e).__name__
+            # Latency is measured from the scheduled start so that a slow
+            # server cannot hide queueing delay (coordinated omission).
+            self.recorder.add(scenario, time.perf_counter() - scheduled,
+                              status)
+        finally:
+            self.users.put_nowait(user)
+
+
+def _pick(mix: list[tuple[str, float]]) -> str:
+    names, weights = zip(*mix)
+    return random.choices(names, weights)[0]
+
+
+async def _closed_loop(client: Client, mix, stop_at: float):
+    async def worker():
+        while time.perf_counter() < stop_at:
+            await client.run_one(_pick(mix), time.perf_counter())
+
+    await asyncio.gather(*(worker() for _ in range(client.args.concurrency)))
+
+
+async def _open_loop(client: Client, mix, rate: float, stop_at: float):
+    tasks = set()
+    next_at = time.perf_counter()
+    while next_at < stop_at:
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        task = asyncio.create_task(client.run_one(_pick(mix), next_at))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        next_at += random.expovariate(rate)
+    await asyncio.gather(*tasks)
+
+
+async def _replay(client: Client, path: str, speed: float):
+    with open(path) as fh:
+        records = [json.loads(line) for line in fh if line.strip()]
+    records.sort(key=lambda r: r['offset_s'])
+
+    tasks = []
+    start = time.perf_counter()
+    for record in records:
+        scheduled = start + record['offset_s'] / speed
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        async def call(user, record=record):
+            return await client._gateway(user, record['service'],
+                                         record['payload'],
+                                         record.get('priority',
+                                                    'interactive'))
+
+        tasks.append(asyncio.create_task(
+            client.run_one(f"replay_{record['service']}", scheduled, call)
+        ))
+    await asyncio.gather(*tasks)
+
+
+def _init_db():
+    from sqlalchemy import text
+
+    from tevye_gpt_server.src.db.base import Base
+    from tevye_gpt_server.src.db.client import engine
+    from tevye_gpt_server.src.modules import auth  # noqa: F401
+    from tevye_gpt_server.src.modules import conversations  # noqa: F401
+
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS citext"))
+        conn.execute(text(
+            "DO $$ BEGIN "
+            "CREATE TYPE role_enum AS ENUM ('user', 'admin', 'auditor'); "
+            "EXCEPTION WHEN duplicate_object THEN NULL; END $$"
+        ))
+    Base.metadata.create_all(engine)
+
+
+def _start_stack(args) -> list[subprocess.Popen]:
+    upstream = subprocess.Popen(
+        [sys.executable, '-m', 'bench.fake_upstream',
+         '--port', str(args.upstream_port), *shlex.split(args.upstream_args)]
+    )
+    upstream_url = f"http://127.0.0.1:{args.upstream_port}"
+    env = {
+        'SECRET': 'bench-secret',
+        'JWT_ALGORITHM': 'HS256',
+        **os.environ,
+        'OPENAI_API': f"{upstream_url}/v1/chat/completions",
+        'OPENAI_EMBEDDINGS_API': f"{upstream_url}/v1/embeddings",
+    }
+    app = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'tevye_gpt_server.src.main:app',
+         '--host', '127.0.0.1', '--port', str(args.app_port),
+         '--log-level', 'warning'],
+        env=env,
+    )
+    args.base_url = f"http://127.0.0.1:{args.app_port}"
+    args.server_pid = app.pid
+    return [app, upstream]
+
+
+async def _wait_ready(session: aiohttp.ClientSession, base_url: str):
+    for _ in range(100):
+        try:
+            async with session.get(f"{base_url}/ready") as resp:
+                if resp.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise SystemExit(f"Server at {base_url} did not become ready")
+
+
+async def _run(args) -> dict:
+    recorder = Recorder()
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=120)
+    async with aiohttp.ClientSession(connector=connector,
+                                     timeout=timeout) as session:
+        await _wait_ready(session, args.base_url)
+        client = Client(session, args.base_url, args, recorder)
+        await client.setup_users(args.users)
+
+        mix = _parse_mix(args.mix)
+        if args.replay is None and args.warmup > 0:
+            await _closed_loop(client, mix,
+                               time.perf_counter() + args.warmup)
+
+        recorder.recording = True
+        cpu_before = _cpu_seconds(args.server_pid)
+        started = time.perf_counter()
+        if args.replay:
+            await _replay(client, args.replay, args.speed)
+        elif args.rate:
+            await _open_loop(client, mix, args.rate,
+                             started + args.duration)
+        else:
+            await _closed_loop(client, mix, started + args.duration)
+        elapsed = time.perf_counter() - started
+        cpu_after = _cpu_seconds(args.server_pid)
+
+    scenarios = recorder.summary(elapsed)
+    total = sum(s['count'] for s in scenarios.values())
+    cpu_ms = None
+    if cpu_before is not None and cpu_after is not None and total:
+        cpu_ms = (cpu_after - cpu_before) * 1000 / total
+
+    return {
+        'commit': _git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'host': platform.node(),
+        'python': platform.python_version(),
+        'config': {k: v for k, v in vars(args).items()
+                   if k not in ('server_pid',)},
+        'elapsed_s': elapsed,
+        'total_requests': total,
+        'throughput_rps': total / elapsed if elapsed else 0,
+        'server_cpu_ms_per_request': cpu_ms,
+        'scenarios': scenarios,
+    }
+
+
+def _print_report(results: dict):
+    print(f"{'scenario':<24}{'count':>8}{'errors':>8}{'rps':>10}"
+          f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, s in results['scenarios'].items():
+        print(f"{name:<24}{s['count']:>8}{s['errors']:>8}"
+              f"{s['throughput_rps']:>10.1f}{s['p50_ms']:>10.1f}"
+              f"{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}")
+    print(f"total {results['total_requests']} requests, "
+          f"{results['throughput_rps']:.1f} req/s")
+    if results['server_cpu_ms_per_request'] is not None:
+        print(f"server CPU {results['server_cpu_ms_per_request']:.2f} "
+              f"ms/request")
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    if args.init_db:
+        _init_db()
+
+    procs = _start_stack(args) if args.start_stack else []
+    try:
+        results = asyncio.run(_run(args))
+    finally:
+        for proc in procs:
+            proc.terminate()
+            proc.wait()
+
+    _print_report(results)
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+        with open(args.out, 'w') as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from tevye_gpt_server.src.controllers import service_controller
+from tevye_gpt_server.src.controllers.service_controller import service
+from tevye_gpt_server.src.interfaces.gateway import GatewayRequest
+from tevye_gpt_server.src.utils.conversation_store import ConversationStore
+
+SYSTEM = {'role': 'system', 'content': 'You are helpful.'}
+
+
+def test_resent_system_prompt_does_not_grow_history():
+    async def run():
+        store = ConversationStore(max_entries=10, ttl_s=60, persist=False)
+        conv = await store.load(await store.create('1', 't'), '1', 't')
+        for i in range(5):
+            turn = [SYSTEM, {'role': 'user', 'content': f'q{i}'}]
+            context = store.context(conv, turn)
+            assert [m['role'] for m in context].count('system') == 1
+            await store.append(conv, turn + [
+                {'role': 'assistant', 'content': f'a{i}'}
+            ])
+        return conv
+
+    conv = asyncio.run(run())
+    assert [m[0] for m in conv.messages].count('system') == 1
+    assert len(conv.messages) == 11
+
+
+def test_cancelled_turn_is_stored_before_lock_release(monkeypatch):
+    store = ConversationStore(max_entries=10, ttl_s=60, persist=False)
+    monkeypatch.setattr(service_controller, 'conversation_store', store)
+    append = store.append
+
+    async def slow_append(conv, messages):
+        await asyncio.sleep(0.05)
+        await append(conv, messages)
+
+    async def reply(*args, **kwargs):
+        return {'choices': [{'message': {'role': 'assistant',
+                                         'content': 'hi'}}]}
+
+    monkeypatch.setattr(store, 'append', slow_append)
+    monkeypatch.setattr(service, 'process_request', reply)
+
+    async def run():
+        conv_id = await store.create('1', 't')
+        data = GatewayRequest(
+            service='chat_completion', conversation_id=conv_id,
+            payload={'messages': [{'role': 'user', 'content': 'hello'}]}
+        )
+        task = asyncio.create_task(service.request(data, 't', '1'))
+        await asyncio.sleep(0.01)
+        conv = await store.load(conv_id, '1', 't')
+        assert conv.lock.locked()
+
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # The lock was held until the append finished.
+        async with conv.lock:
+            return [m[1] for m in conv.messages]
+
+    assert asyncio.run(run()) == ['hello', 'hi']
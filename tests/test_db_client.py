@@ -0,0 +1,131 @@
+import pytest
+
+from sqlalchemy import create_engine, literal, select, update
+from sqlalchemy.pool import StaticPool
+
+from tevye_gpt_server.src.db import client
+from tevye_gpt_server.src.modules.auth import User
+
+
+class FakeReplica():
+    def __init__(self, name: str, in_use: int = 0, healthy: bool = True):
+        self.name = name
+        self.engine = create_engine('sqlite://', poolclass=StaticPool)
+        self.healthy = healthy
+        self._in_use = in_use
+
+    def in_use(self) -> int:
+        return self._in_use
+
+
+def _replica_set(replicas, selection='round_robin'):
+    replica_set = client.ReplicaSet([], selection)
+    replica_set.replicas = replicas
+    # No background health checks in tests.
+    replica_set._checker = object()
+    return replica_set
+
+
+@pytest.fixture
+def primary(monkeypatch):
+    engine = create_engine('sqlite://', poolclass=StaticPool)
+    monkeypatch.setattr(client, 'engine', engine)
+    return engine
+
+
+@pytest.fixture
+def replicas(monkeypatch):
+    replica_set = _replica_set([FakeReplica('r1'), FakeReplica('r2')])
+    monkeypatch.setattr(client, 'replicas', replica_set)
+    return replica_set
+
+
+def _session(primary):
+    return client.RoutingSession(bind=primary)
+
+
+def test_select_goes_to_replica(primary, replicas):
+    db = _session(primary)
+    bind = db.get_bind(clause=select(User))
+    assert bind in [r.engine for r in replicas.replicas]
+
+
+def test_dml_pins_primary(primary, replicas):
+    db = _session(primary)
+    assert db.get_bind(clause=update(User).values(is_active=False)) \
+        is primary
+    assert db.get_bind(clause=select(User)) is primary
+
+
+def test_flush_pins_primary(primary, replicas):
+    db = _session(primary)
+    db._flushing = True
+    assert db.get_bind(clause=select(User)) is primary
+    db._flushing = False
+    assert db.get_bind(clause=select(User)) is primary
+
+
+def test_use_primary_sticks(primary, replicas):
+    db = _session(primary)
+    client.use_primary(db)
+    for _ in range(3):
+        assert db.get_bind(clause=select(User)) is primary
+
+
+def test_all_unhealthy_falls_back_to_primary(primary, replicas):
+    for replica in replicas.replicas:
+        replica.healthy = False
+    db = _session(primary)
+    assert db.get_bind(clause=select(User)) is primary
+    # Falling back is not a write, so reads can return to replicas.
+    replicas.replicas[0].healthy = True
+    assert db.get_bind(clause=select(User)) is replicas.replicas[0].engine
+
+
+def test_failed_replica_read_retries_on_primary(primary, monkeypatch):
+    broken = FakeReplica('broken')
+    broken.engine = create_engine(
+        'postgresql://u:p@127.0.0.1:1/db',
+        connect_args={'connect_timeout': 1}
+    )
+    monkeypatch.setattr(client, 'replicas', _replica_set([broken]))
+
+    db = _session(primary)
+    assert db.execute(select(literal(7))).scalar() == 7
+    assert db.get_bind(clause=select(User)) is primary
+
+
+@pytest.mark.parametrize('method', ['scalar', 'scalars'])
+def test_failed_replica_scalar_retries_on_primary(primary, monkeypatch,
+                                                  method):
+    broken = FakeReplica('broken')
+    broken.engine = create_engine(
+        'postgresql://u:p@127.0.0.1:1/db',
+        connect_args={'connect_timeout': 1}
+    )
+    monkeypatch.setattr(client, 'replicas', _replica_set([broken]))
+
+    db = _session(primary)
+    result = getattr(db, method)(select(literal(7)))
+    assert (result if method == 'scalar' else result.one()) == 7
+
+
+def test_round_robin_skips_unhealthy():
+    r1, r2, r3 = FakeReplica('r1'), FakeReplica('r2', healthy=False), \
+        FakeReplica('r3')
+    replica_set = _replica_set([r1, r2, r3])
+    picked = [replica_set.pick().name for _ in range(4)]
+    assert picked == ['r1', 'r3', 'r1', 'r3']
+
+
+def test_least_connections_picks_idlest_healthy():
+    replica_set = _replica_set([
+        FakeReplica('busy', in_use=5),
+        FakeReplica('idle', in_use=0, healthy=False),
+        FakeReplica('quiet', in_use=1),
+    ], selection='least_connections')
+    assert replica_set.pick().name == 'quiet'
+
+
+def test_empty_replica_set_picks_nothing():
+    assert client.ReplicaSet([], 'round_robin').pick() is None
@@ -0,0 +1,57 @@
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from tevye_gpt_server.src.config.settings import settings
+from tevye_gpt_server.src.controllers.service_controller import service
+from tevye_gpt_server.src.interfaces.gateway import Priority
+from tevye_gpt_server.src.modules import services
+from tevye_gpt_server.src.utils.scheduler import FairScheduler
+
+
+def test_batching_while_scheduler_saturated(monkeypatch):
+    scheduler = FairScheduler(
+        max_in_flight=2,
+        max_queue_ms=5000,
+        tenant_weights={},
+        priority_weights={Priority.interactive: 4.0, Priority.batch: 1.0},
+    )
+    monkeypatch.setattr(services, 'scheduler', scheduler)
+    monkeypatch.setattr(settings, 'EMBEDDINGS_BATCH_MAX_WAIT_MS', 20.0)
+    batch_sizes = []
+
+    async def embeddings(request):
+        body = await request.json()
+        batch_sizes.append(len(body['input']))
+        await asyncio.sleep(0.05)
+        return web.json_response({'data': [
+            {'index': i, 'embedding': [float(len(text))]}
+            for i, text in enumerate(body['input'])
+        ]})
+
+    async def run():
+        app = web.Application()
+        app.router.add_post('/v1/embeddings', embeddings)
+        async with TestServer(app) as server:
+            monkeypatch.setenv('OPENAI_EMBEDDINGS_API',
+                               str(server.make_url('/v1/embeddings')))
+            # A long chat call holds one of the two slots.
+            await scheduler.acquire('chat', Priority.interactive)
+            results = await asyncio.gather(*(
+                service.process_request(
+                    'embeddings',
+                    {'model': settings.EMBEDDINGS_MODELS[0],
+                     'input': 'x' * (i + 1)},
+                    f"tenant-{i % 4}",
+                )
+                for i in range(40)
+            ))
+            scheduler.release()
+        return results
+
+    results = asyncio.run(run())
+    assert batch_sizes == [40]
+    assert [r['data'][0]['embedding'] for r in results] == \
+        [[float(i + 1)] for i in range(40)]
+    assert scheduler._in_flight == 0
@@ -1,3 +1,4 @@
+from typing import Literal
 from pydantic import AnyUrl, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -16,6 +17,49 @@ class Settings(BaseSettings):
     DB_POOL_RECYCLE: int = 1800
     DB_POOL_PRE_PING: bool = True
     DB_SSLMODE: str | None = None
+    DB_REPLICA_DSNS: list[PostgresDsn] = Field(default_factory=list)
+    DB_REPLICA_SELECTION: Literal['round_robin', 'least_connections'] = \
+        'round_robin'
+    DB_REPLICA_MAX_LAG_S: float = 5.0
+    DB_REPLICA_MAX_LAG_BYTES: int = 16 * 1024 * 1024
+    DB_REPLICA_CONNECT_TIMEOUT_S: int = 2
+    DB_REPLICA_CHECK_INTERVAL_S: float = 10.0
+
+    PROFILING_ENABLED: bool = False
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_HEADER: str = 'X-Profile'
+    PROFILING_DIR: str = '/tmp/tevye_profiles'
+    PROFILING_MAX_FILES: int = 500
+    PROFILING_SKIP_PATHS: list[str] = Field(
+        default_factory=lambda: ['/live', '/ready', '/metrics']
+    )
+
+    EMBEDDINGS_BATCH_MAX_SIZE: int = 64
+    EMBEDDINGS_BATCH_MAX_WAIT_MS: float = 5.0
+    EMBEDDINGS_MODELS: list[str] = Field(default_factory=lambda: [
+        'text-embedding-3-small',
+        'text-embedding-3-large',
+        'text-embedding-ada-002',
+    ])
+
+    DEADLINE_HEADER: str = 'X-Request-Deadline-Ms'
+
+    SCHEDULER_MAX_IN_FLIGHT: int = 64
+    SCHEDULER_MAX_QUEUE_MS: float = 30000
+    SCHEDULER_TENANT_WEIGHTS: dict[str, float] = Field(default_factory=dict)
+    SCHEDULER_INTERACTIVE_WEIGHT: float = 4.0
+    SCHEDULER_BATCH_WEIGHT: float = 1.0
+
+    WS_MAX_IN_FLIGHT: int = 16
+
+    TRAFFIC_RECORD_PATH: str | None = None
+    TRAFFIC_RECORD_SAMPLE_RATE: float = 1.0
+
+    CONVERSATION_CACHE_SIZE: int = 10000
+    CONVERSATION_TTL_S: float = 3600
+    CONVERSATION_PERSIST: bool = False
+    CONVERSATION_MAX_MESSAGES: int = 50
+    CONVERSATION_MAX_CHARS: int = 200000
 
     model_config = SettingsConfigDict(
         env_file='.env',
@@ -1,35 +1,111 @@
+import asyncio
 import structlog
 
 from fastapi import HTTPException, status
 
+from tevye_gpt_server.src.interfaces.gateway import Priority
+from tevye_gpt_server.src.utils.conversation_store import (
+    conversation_store
+)
+from tevye_gpt_server.src.utils.profiling import span
+from tevye_gpt_server.src.utils.scheduler import scheduler
 from tevye_gpt_server.src.utils.service_registry import SERVICE_REGISTRY
 
 log = structlog.get_logger(__name__='service controller')
 
 
-class ServiceRequest():
+def _assistant_reply(result) -> dict | None:
+    if not isinstance(result, dict):
+        return None
+    choices = result.get('choices') or []
+    if not choices or not isinstance(choices[0].get('message'), dict):
+        return None
+    return choices[0]['message']
+
+
+async def _append_uncancellable(conv, messages: list[dict]):
+    """
+    Append a turn and return only once it is stored, even if the caller is
+    cancelled meanwhile, so a caller holding conv.lock keeps it until then.
+    """
+    task = asyncio.ensure_future(conversation_store.append(conv, messages))
+    try:
+        return await asyncio.shield(task)
+    except asyncio.CancelledError:
+        await asyncio.wait([task])
+        if not task.cancelled() and task.exception() is not None:
+            log.error("Conversation append failed after cancellation",
+                      error=str(task.exception()))
+        raise
 
-    def __init__(self):
-        self.service = None
-        self.payload = {}
 
-    async def request(self, data):
-        self.service = data.service
-        self.payload = data.payload
+class ServiceRequest():
+
+    async def request(self, data, tenant: str, sub: str):
+        if data.conversation_id:
+            return await self.conversation_request(data, tenant, sub)
 
-        response = await self.process_request()
+        response = await self.process_request(
+            data.service, data.payload, tenant, data.priority
+        )
         return response
 
-    async def process_request(self):
-        log.info(f"Processing request for {self.service}...")
-        service_handler = SERVICE_REGISTRY.get(self.service)
+    async def conversation_request(self, data, tenant: str, sub: str):
+        """
+        Treat payload['messages'] as the new turns of a stored conversation,
+        send the assembled context upstream and keep the assistant reply.
+        """
+        if data.service != 'chat_completion':
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,  # noqa: E501
+                                detail="conversation_id is only supported for chat_completion")  # noqa: E501
+
+        new_messages = data.payload.get('messages')
+        if not isinstance(new_messages, list) or \
+                not all(isinstance(m, dict) for m in new_messages):
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,  # noqa: E501
+                                detail="payload.messages must be a list of messages")  # noqa: E501
+
+        conv = await conversation_store.load(data.conversation_id, sub,
+                                             tenant)
+        async with conv.lock:
+            with span('conversation_context'):
+                payload = {**data.payload,
+                           'messages': conversation_store.context(
+                               conv, new_messages)}
+            result = await self.process_request(
+                data.service, payload, tenant, data.priority
+            )
+
+            reply = _assistant_reply(result)
+            if reply is not None:
+                # A client disconnect must neither leave memory and Postgres
+                # disagreeing nor let the next turn in before this one is
+                # stored.
+                await _append_uncancellable(conv, new_messages + [reply])
+        return result
+
+    async def process_request(self, service_name: str, payload: dict,
+                              tenant: str,
+                              priority: Priority = Priority.interactive):
+        log.info(f"Processing request for {service_name}...")
+        service_handler = SERVICE_REGISTRY.get(service_name)
 
         if not service_handler:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                                 detail="Service not found")
 
-        result = await service_handler.request(self.payload)
-        log.info(f"Service {self.service} processed successfully.")
+        if service_handler.schedules_upstream:
+            with span(f'upstream_{service_name}'):
+                result = await service_handler.request(payload)
+        else:
+            with span('scheduler_queue'):
+                await scheduler.acquire(tenant, priority)
+            try:
+                with span(f'upstream_{service_name}'):
+                    result = await service_handler.request(payload)
+            finally:
+                scheduler.release()
+        log.info(f"Service {service_name} processed successfully.")
         return result
 
 
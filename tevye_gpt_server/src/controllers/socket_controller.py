@@ -0,0 +1,149 @@
+import time
+import json
+import asyncio
+import structlog
+
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect, status
+from pydantic import ValidationError
+
+from tevye_gpt_server.src.config.settings import settings
+from tevye_gpt_server.src.controllers.service_controller import service
+from tevye_gpt_server.src.interfaces.gateway import GatewaySocketMessage
+from tevye_gpt_server.src.utils.deadlines import (
+    cancelled_total,
+    deadline_exceeded_total
+)
+
+log = structlog.get_logger(__name__='socket controller')
+
+
+class ServiceSocket():
+    """
+    Multiplex tagged service calls over one authenticated WebSocket.
+
+    Every message carries an `id`; replies are sent back as soon as each
+    call finishes, tagged with the same id, so they may arrive out of order.
+    A `{"type": "cancel", "id": ...}` message cancels one call and closing
+    the socket cancels all of them.
+    """
+
+    def __init__(self, websocket: WebSocket, claims: dict):
+        self.websocket = websocket
+        self.claims = claims
+        self.tenant = str(claims.get('tid') or claims.get('sub'))
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._send_lock = asyncio.Lock()
+
+    def _expired(self) -> bool:
+        exp = self.claims.get('exp')
+        return exp is not None and exp <= time.time()
+
+    async def _send(self, message: dict):
+        async with self._send_lock:
+            try:
+                await self.websocket.send_json(message)
+            except (WebSocketDisconnect, RuntimeError):
+                pass
+
+    async def _send_error(self, request_id, status_code: int, detail):
+        await self._send({'id': request_id, 'type': 'error',
+                          'status': status_code, 'detail': detail})
+
+    async def serve(self):
+        try:
+            while True:
+                frame = await self.websocket.receive()
+                if frame['type'] == 'websocket.disconnect':
+                    raise WebSocketDisconnect(frame.get('code', 1000),
+                                              frame.get('reason'))
+                if self._expired():
+                    log.info("Token expired, closing socket",
+                             sub=self.claims.get('sub'))
+                    await self.websocket.close(
+                        code=status.WS_1008_POLICY_VIOLATION,
+                        reason='Token expired'
+                    )
+                    return
+                if frame.get('text') is None:
+                    await self._send_error(None, status.HTTP_400_BAD_REQUEST,
+                                           'Binary frames are not supported')
+                    continue
+                await self._handle(frame['text'])
+        except WebSocketDisconnect:
+            log.info("Socket disconnected", sub=self.claims.get('sub'),
+                     outstanding=len(self._tasks))
+        finally:
+            tasks = list(self._tasks.values())
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                cancelled_total.inc(len(tasks))
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _handle(self, raw: str):
+        try:
+            message = json.loads(raw)
+        except json.JSONDecodeError:
+            await self._send_error(None, status.HTTP_400_BAD_REQUEST,
+                                   'Invalid JSON')
+            return
+        if not isinstance(message, dict):
+            await self._send_error(None, status.HTTP_400_BAD_REQUEST,
+                                   'Message must be an object')
+            return
+
+        if message.get('type') == 'cancel':
+            request_id = str(message.get('id'))
+            task = self._tasks.get(request_id)
+            if task:
+                task.cancel()
+                cancelled_total.inc()
+            await self._send({'id': request_id, 'type': 'cancelled'})
+            return
+
+        try:
+            data = GatewaySocketMessage.model_validate(message)
+        except ValidationError as e:
+            await self._send_error(
+                message.get('id'), status.HTTP_422_UNPROCESSABLE_ENTITY,
+                e.errors(include_url=False, include_context=False)
+            )
+            return
+
+        if data.id in self._tasks:
+            await self._send_error(data.id, status.HTTP_409_CONFLICT,
+                                   'Request id already in flight')
+            return
+        if len(self._tasks) >= settings.WS_MAX_IN_FLIGHT:
+            await self._send_error(data.id,
+                                   status.HTTP_429_TOO_MANY_REQUESTS,
+                                   'Too many requests in flight')
+            return
+
+        task = asyncio.create_task(self._run(data))
+        self._tasks[data.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(data.id, None))
+
+    async def _run(self, data: GatewaySocketMessage):
+        log.info("Socket request", id=data.id, service=data.service)
+        try:
+            work = service.request(data, self.tenant,
+                                   str(self.claims.get('sub')))
+            if data.deadline_ms is not None:
+                result = await asyncio.wait_for(work, data.deadline_ms / 1000)
+            else:
+                result = await work
+        except asyncio.TimeoutError:
+            deadline_exceeded_total.inc()
+            await self._send_error(data.id, status.HTTP_504_GATEWAY_TIMEOUT,
+                                   'Deadline exceeded')
+        except HTTPException as e:
+            await self._send_error(data.id, e.status_code, e.detail)
+        except Exception as e:
+            log.error("Unexpected error occurred", id=data.id, error=str(e))
+            await self._send_error(data.id,
+                                   status.HTTP_500_INTERNAL_SERVER_ERROR,
+                                   'Internal Server Error')
+        else:
+            await self._send({'id': data.id, 'type': 'result',
+                              'status': status.HTTP_200_OK, 'data': result})
@@ -1,6 +1,26 @@
-from pydantic import BaseModel
+import enum
+
+from pydantic import BaseModel, Field
+
+
+class Priority(str, enum.Enum):
+    interactive = 'interactive'
+    batch = 'batch'
 
 
 class GatewayRequest(BaseModel):
     service: str
     payload: dict
+    priority: Priority = Priority.interactive
+    conversation_id: str | None = Field(default=None, min_length=1,
+                                        max_length=128)
+
+
+class GatewaySocketMessage(GatewayRequest):
+    id: str
+    deadline_ms: float | None = Field(default=None, gt=0,
+                                      allow_inf_nan=False)
+
+
+class ConversationOut(BaseModel):
+    conversation_id: str
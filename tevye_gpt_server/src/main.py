@@ -1,8 +1,10 @@
 from fastapi import FastAPI
 
+from tevye_gpt_server.src.config.settings import settings
 from tevye_gpt_server.src.routes import health
 from tevye_gpt_server.src.routes import gateway
 from tevye_gpt_server.src.routes import auth
+from tevye_gpt_server.src.utils.profiling import ProfilingMiddleware
 
 app = FastAPI(title='Tevye GPT Server', docs_url='/swagger',
               openapi_url='/openapi.json', version='0.4.0')
@@ -10,3 +12,6 @@ app = FastAPI(title='Tevye GPT Server', docs_url='/swagger',
 app.include_router(health.router)
 app.include_router(gateway.router)
 app.include_router(auth.router)
+
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
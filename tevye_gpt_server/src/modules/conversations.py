@@ -0,0 +1,49 @@
+from datetime import datetime
+from sqlalchemy import (
+    Text, DateTime, ForeignKey, Index, BigInteger, func
+)
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import JSONB
+
+from tevye_gpt_server.src.db.base import Base
+
+
+class Conversation(Base):
+    __tablename__ = 'conversations'
+
+    id: Mapped[str] = mapped_column(Text, primary_key=True)
+    owner_sub: Mapped[str] = mapped_column(Text, nullable=False, index=True)
+    tenant: Mapped[str] = mapped_column(Text, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False
+        )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False
+        )
+
+
+class ConversationMessage(Base):
+    __tablename__ = 'conversation_messages'
+
+    __table_args__ = (
+        Index('ix_conversation_messages_conversation_id_id',
+              'conversation_id', 'id'),
+    )
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    conversation_id: Mapped[str] = mapped_column(
+        ForeignKey('conversations.id', ondelete='CASCADE'),
+        nullable=False
+    )
+    role: Mapped[str] = mapped_column(Text, nullable=False)
+    content: Mapped[object] = mapped_column(JSONB, nullable=True)
+    extra: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False
+    )
@@ -1,10 +1,24 @@
 import os
+import asyncio
 import aiohttp
 
 from abc import ABC, abstractmethod
+from fastapi import HTTPException, status
+
+from tevye_gpt_server.src.config.settings import settings
+from tevye_gpt_server.src.interfaces.gateway import Priority
+from tevye_gpt_server.src.utils.batching import BatchRejected, MicroBatcher
+from tevye_gpt_server.src.utils.scheduler import scheduler
+
+# Scheduler flow charged for batched embeddings calls, which mix tenants.
+EMBEDDINGS_FLOW = 'batch:embeddings'
 
 
 class ServiceHandler(ABC):
+    # Handlers that take a scheduler slot per upstream call themselves
+    # instead of one per gateway caller.
+    schedules_upstream: bool = False
+
     @abstractmethod
     async def request(self, service_request):
         ...
@@ -20,3 +34,97 @@ class ChatCompletion(ServiceHandler):
                     return response_data
             except Exception as e:
                 return {"error": str(e)}
+
+
+class Embeddings(ServiceHandler):
+    """
+    Embeddings handler that coalesces concurrent requests for the same model
+    into a single upstream call. Only models listed in EMBEDDINGS_MODELS are
+    accepted, which also bounds the number of batchers kept.
+
+    A scheduler slot is taken per upstream batch call rather than per
+    caller, so callers waiting in a batcher do not hold slots and batches
+    are not capped at SCHEDULER_MAX_IN_FLIGHT.
+    """
+
+    schedules_upstream = True
+
+    def __init__(self):
+        self._batchers: dict[str, MicroBatcher] = {}
+
+    def _batcher(self, model: str) -> MicroBatcher:
+        batcher = self._batchers.get(model)
+        if batcher is None:
+            async def embed(texts):
+                return await self._embed_batch(model, texts)
+
+            batcher = MicroBatcher(
+                'embeddings',
+                embed,
+                max_size=settings.EMBEDDINGS_BATCH_MAX_SIZE,
+                max_wait_ms=settings.EMBEDDINGS_BATCH_MAX_WAIT_MS,
+            )
+            self._batchers[model] = batcher
+        return batcher
+
+    async def _embed_batch(self, model: str, texts: list[str]):
+        url = os.getenv("OPENAI_EMBEDDINGS_API")
+        await scheduler.acquire(EMBEDDINGS_FLOW, Priority.interactive)
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.post(
+                    url, json={"model": model, "input": texts}
+                ) as resp:
+                    response_data = await resp.json(content_type=None)
+        finally:
+            scheduler.release()
+
+        if "data" not in response_data:
+            error = response_data.get("error", response_data)
+            # The upstream refused (part of) the input rather than being
+            # unavailable, rate limited or misconfigured.
+            if resp.status in (400, 413, 422):
+                raise BatchRejected(error)
+            raise RuntimeError(error)
+
+        results: list = [ValueError("Missing embedding in upstream response")
+                         ] * len(texts)
+        for item in response_data["data"]:
+            results[item["index"]] = item["embedding"]
+        return results
+
+    async def request(self, service_request):
+        model = service_request.get("model")
+        texts = service_request.get("input")
+        if isinstance(texts, str):
+            texts = [texts]
+
+        if not isinstance(model, str) or not model:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,  # noqa: E501
+                                detail="payload.model must be a non-empty string")  # noqa: E501
+        if model not in settings.EMBEDDINGS_MODELS:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,  # noqa: E501
+                                detail=f"Unsupported embeddings model {model!r}")  # noqa: E501
+        if not isinstance(texts, list) or not texts or \
+                not all(isinstance(t, str) and t for t in texts):
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,  # noqa: E501
+                                detail="payload.input must be a non-empty string or list of strings")  # noqa: E501
+
+        batcher = self._batcher(model)
+        try:
+            embeddings = await asyncio.gather(
+                *(batcher.submit(text) for text in texts)
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            return {"error": str(e)}
+
+        return {
+            "object": "list",
+            "model": model,
+            "data": [
+                {"object": "embedding", "index": i, "embedding": embedding}
+                for i, embedding in enumerate(embeddings)
+            ],
+        }
@@ -14,7 +14,7 @@ from fastapi import (
 )
 
 
-from tevye_gpt_server.src.db.client import get_db
+from tevye_gpt_server.src.db.client import get_db, use_primary
 from tevye_gpt_server.src.interfaces.auth import RegisterIn, TokenOut, LoginIn
 from tevye_gpt_server.src.controllers.auth_controller import (
     set_refresh_cookie,
@@ -36,6 +36,7 @@ from tevye_gpt_server.src.utils.app_security import (
     decode_access_token,
     REFRESH_TTL, ACCESS_TTL
 )
+from tevye_gpt_server.src.utils.profiling import profiled, span
 
 router = APIRouter(prefix='/auth', tags=['auth'])
 log = structlog.get_logger(__name__='auth_routes')
@@ -55,10 +56,12 @@ def _utcnow():
 
 
 @router.post('/login', response_model=TokenOut, status_code=status.HTTP_200_OK)
+@profiled
 def login(data: LoginIn, request: Request,
           response: Response, db: Session = Depends(get_db)):
     email_norm = data.email.strip().lower()
-    user = db.query(User).filter(func.lower(User.email) == email_norm).first()
+    with span('db_user_lookup'):
+        user = db.query(User).filter(func.lower(User.email) == email_norm).first()  # noqa: E501
 
     if not user:
         raise HTTPException(status_code=401,
@@ -67,7 +70,9 @@ def login(data: LoginIn, request: Request,
     if hasattr(user, 'is_active') and not user.is_active:
         raise HTTPException(status_code=403, detail='User is inactive')
 
-    if not verify_password(data.password, user.pwd_hash):
+    with span('password_verify'):
+        password_ok = verify_password(data.password, user.pwd_hash)
+    if not password_ok:
         raise HTTPException(status_code=401,
                             detail='Invalid email or password')
 
@@ -87,17 +92,21 @@ def login(data: LoginIn, request: Request,
     )
 
     db.add(sess)
-    db.flush()
-
-    access = make_access_token(
-        sub=str(user.id),
-        sid=str(sess.id),
-        roles=_roles_claim(user),
-        token_version=user.token_version
-    )
+    with span('db_session_flush'):
+        db.flush()
+
+    with span('jwt_encode'):
+        access = make_access_token(
+            sub=str(user.id),
+            sid=str(sess.id),
+            roles=_roles_claim(user),
+            token_version=user.token_version,
+            tenant_id=user.tenant_id
+        )
 
     try:
-        db.commit()
+        with span('db_commit'):
+            db.commit()
     except IntegrityError as e:
         db.rollback()
         log.error('DB error on login commit', error=str(e))
@@ -112,19 +121,24 @@ def login(data: LoginIn, request: Request,
 
 @router.post("/refresh", response_model=TokenOut,
              status_code=status.HTTP_200_OK)
+@profiled
 def refresh_token(request: Request, response: Response,
                   db: Session = Depends(get_db)):
     raw = get_refresh_from_request(request)
     if not raw:
         raise HTTPException(status_code=401, detail="Missing refresh token")
 
+    # Rotation must see the latest refresh_hash, or a replayed token could
+    # be accepted from a lagging replica.
+    use_primary(db)
     h = hash_refresh(raw)
-    sess = (
-        db.query(RefreshSession)
-          .filter(RefreshSession.refresh_hash == h,
-                  RefreshSession.is_active.is_(True))
-          .first()
-    )
+    with span('db_session_lookup'):
+        sess = (
+            db.query(RefreshSession)
+              .filter(RefreshSession.refresh_hash == h,
+                      RefreshSession.is_active.is_(True))
+              .first()
+        )
     if not sess:
         raise HTTPException(status_code=401, detail="Invalid refresh token")
 
@@ -134,7 +148,8 @@ def refresh_token(request: Request, response: Response,
         clear_refresh_cookie(response)
         raise HTTPException(status_code=401, detail="Refresh expired")
 
-    user = db.query(User).get(sess.user_id)
+    with span('db_user_lookup'):
+        user = db.query(User).get(sess.user_id)
     if not user or (hasattr(user, "is_active") and not user.is_active):
         sess.is_active = False
         db.commit()
@@ -146,14 +161,17 @@ def refresh_token(request: Request, response: Response,
     sess.jti = meta["jti"]
     sess.expires_at = _utcnow() + REFRESH_TTL
 
-    access = make_access_token(
-        sub=str(user.id),
-        sid=str(sess.id),
-        roles=_roles_claim(user),
-        token_version=user.token_version,
-    )
+    with span('jwt_encode'):
+        access = make_access_token(
+            sub=str(user.id),
+            sid=str(sess.id),
+            roles=_roles_claim(user),
+            token_version=user.token_version,
+            tenant_id=user.tenant_id,
+        )
 
-    db.commit()
+    with span('db_commit'):
+        db.commit()
 
     set_refresh_cookie(response, new_refresh,
                        max_age=int(REFRESH_TTL.total_seconds()))
@@ -171,6 +189,7 @@ def logout(request: Request, response: Response,
         clear_refresh_cookie(response)
         return Response(status_code=status.HTTP_204_NO_CONTENT)
 
+    use_primary(db)
     h = hash_refresh(raw)
     sess = (
         db.query(RefreshSession)
@@ -230,8 +249,10 @@ def logout_all(request: Request, response: Response,
 
 @router.post('/register', response_model=TokenOut,
              status_code=status.HTTP_201_CREATED)
+@profiled
 def register_user(data: RegisterIn, request: Request,
                   response: Response, db: Session = Depends(get_db)):
+    use_primary(db)
     tenant_id = None
     if data.tenant_name:
         tenant = db.query(Tenant).filter(func.lower(Tenant.name) == data.tenant_name.strip().lower()).first()  # noqa: E501
@@ -281,7 +302,8 @@ def register_user(data: RegisterIn, request: Request,
         sub=str(user.id),
         sid=str(sess.id),
         roles=[r.value for r in user.roles],
-        token_version=user.token_version
+        token_version=user.token_version,
+        tenant_id=user.tenant_id
     )
     refresh, meta = make_refresh_token(
         sub=str(user.id),
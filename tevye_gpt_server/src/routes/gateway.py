@@ -1,17 +1,37 @@
+import time
 import structlog
 
-from fastapi import APIRouter, Request, Response
+from fastapi import APIRouter, Request, Response, WebSocket, status
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import HTTPException
 
-from tevye_gpt_server.src.interfaces.gateway import GatewayRequest
+from tevye_gpt_server.src.interfaces.gateway import (
+    ConversationOut,
+    GatewayRequest
+)
 from tevye_gpt_server.src.controllers.service_controller import service
-from tevye_gpt_server.src.utils.app_security import verify_jwt_from_request
+from tevye_gpt_server.src.controllers.socket_controller import ServiceSocket
+from tevye_gpt_server.src.utils.app_security import (
+    verify_jwt,
+    verify_jwt_from_request
+)
+from tevye_gpt_server.src.utils.conversation_store import (
+    conversation_store
+)
+from tevye_gpt_server.src.utils.deadlines import (
+    deadline_from_request,
+    ensure_budget,
+    run_until_disconnect
+)
+from tevye_gpt_server.src.utils.profiling import span
+from tevye_gpt_server.src.utils.traffic_recorder import recorder
 
 
 router = APIRouter(prefix='/gateway', tags=['gateway'])
 log = structlog.get_logger(__name__='index routes')
 
+SOCKET_AUTH_PROTOCOL = 'bearer'
+
 
 @router.post('/services', status_code=200)
 async def request_service(data: GatewayRequest, request: Request,
@@ -20,16 +40,81 @@ async def request_service(data: GatewayRequest, request: Request,
     Route to handle requests to tevye ecosystem services.
     '''
     log.info("Request received", method=request.method, url=request.url)
-    claims = verify_jwt_from_request(request)
+    deadline = deadline_from_request(request)
+    with span('jwt_verify'):
+        claims = verify_jwt_from_request(request)
     log.info("JWT verified", sub=claims.get('sub'), scopes=claims.get('scope'))
+    tenant = str(claims.get('tid') or claims.get('sub'))
 
+    started = time.perf_counter()
+    status_code = 500
     try:
         log.info("Request data", service=data.service)
-        service_response = await service.request(data)
+        ensure_budget(deadline)
+        service_response = await run_until_disconnect(
+            request, service.request(data, tenant, str(claims.get('sub'))),
+            deadline
+        )
+        status_code = 200
         return JSONResponse(status_code=200, content=service_response)
     except HTTPException as e:
+        status_code = e.status_code
         log.error("HTTP exception occurred", detail=str(e.detail))
         raise e
     except Exception as e:
         log.error("Unexpected error occurred", error=str(e))
         return JSONResponse(status_code=500, content={'message': 'Internal Server Error'})    # noqa: E501
+    finally:
+        if recorder:
+            recorder.record(data.service, data.priority.value, data.payload,
+                            status_code,
+                            (time.perf_counter() - started) * 1000)
+
+
+@router.post('/conversations', response_model=ConversationOut,
+             status_code=201)
+async def create_conversation(request: Request):
+    '''
+    Start a server-side conversation. Pass the returned id as
+    `conversation_id` to /gateway/services and send only new messages.
+    '''
+    claims = verify_jwt_from_request(request)
+    tenant = str(claims.get('tid') or claims.get('sub'))
+    conversation_id = await conversation_store.create(
+        str(claims.get('sub')), tenant
+    )
+    log.info("Conversation created", sub=claims.get('sub'),
+             conversation_id=conversation_id)
+    return ConversationOut(conversation_id=conversation_id)
+
+
+def _socket_protocol_token(websocket: WebSocket) -> str | None:
+    # Browsers cannot set headers on a WebSocket, so they pass the token as
+    # a subprotocol: new WebSocket(url, ['bearer', token]). Unlike a query
+    # parameter it does not end up in access logs.
+    protocols = [p.strip() for p in websocket.headers.get(
+        'sec-websocket-protocol', '').split(',')]
+    if len(protocols) == 2 and protocols[0] == SOCKET_AUTH_PROTOCOL:
+        return protocols[1]
+    return None
+
+
+@router.websocket('/ws')
+async def service_socket(websocket: WebSocket):
+    '''
+    WebSocket multiplexing many service calls over one authenticated
+    connection. The token is read from the Authorization header or, for
+    browsers, from the `bearer` subprotocol.
+    '''
+    token = _socket_protocol_token(websocket)
+    try:
+        claims = verify_jwt(token) if token \
+            else verify_jwt_from_request(websocket)
+    except HTTPException as e:
+        log.info("Socket rejected", detail=str(e.detail))
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept(subprotocol=SOCKET_AUTH_PROTOCOL if token else None)
+    log.info("Socket connected", sub=claims.get('sub'))
+    await ServiceSocket(websocket, claims).serve()
@@ -1,6 +1,10 @@
 import structlog
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Request, status
+
+from tevye_gpt_server.src.modules.auth import RoleEnum
+from tevye_gpt_server.src.utils import metrics
+from tevye_gpt_server.src.utils.app_security import verify_jwt_from_request
 
 router = APIRouter()
 log = structlog.get_logger(__name__='health routes')
@@ -22,3 +26,15 @@ def ready():
     '''
     log.info("Readiness check called")
     return {'message': 'Tevye OpenAI API is ready!'}
+
+
+@router.get('/metrics', tags=['Health'])
+def get_metrics(request: Request):
+    '''
+    Route to expose in-process counters and histograms to admins
+    '''
+    claims = verify_jwt_from_request(request)
+    if RoleEnum.admin.value not in (claims.get('roles') or []):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                            detail="Admin role required")
+    return metrics.snapshot()
@@ -45,7 +45,8 @@ def make_access_token(
     sub: str,
     sid: str,
     roles: List[str],
-    token_version: int
+    token_version: int,
+    tenant_id: int | None = None
 ) -> str:
     now = _utcnow()
     payload = {
@@ -53,6 +54,7 @@ def make_access_token(
         "sid": sid,
         "roles": roles,
         "tv": token_version,
+        "tid": tenant_id,
         "iat": int(now.timestamp()),
         "exp": int((now + ACCESS_TTL).timestamp()),
         "jti": secrets.token_urlsafe(16),
@@ -91,7 +93,13 @@ def verify_jwt_from_request(request) -> dict:
         )
 
     token = auth_header.removeprefix("Bearer ").strip()
+    return verify_jwt(token)
 
+
+def verify_jwt(token: str) -> dict:
+    """
+    Validate a raw JWT access token and return its claims.
+    """
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])
         # Aqui o senhor pode validar iss, aud, roles, etc.
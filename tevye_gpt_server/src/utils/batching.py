@@ -0,0 +1,117 @@
+import time
+import asyncio
+import structlog
+
+from typing import Any, Awaitable, Callable
+
+from tevye_gpt_server.src.utils.metrics import histogram
+
+log = structlog.get_logger(__name__='batching')
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+BATCH_WAIT_MS_BUCKETS = [0.5, 1, 2, 5, 10, 20, 50, 100]
+
+
+class BatchRejected(Exception):
+    """
+    Raised by a batch_fn when the upstream refused the batch because of its
+    content (e.g. one invalid item), as opposed to being unavailable.
+    """
+
+
+class MicroBatcher():
+    """
+    Collect concurrent submissions for up to max_size items or max_wait_ms,
+    run them through a single batch_fn call and hand each caller its own
+    result.
+
+    batch_fn receives the list of items and must return a list of the same
+    length. An exception instance returned in the list fails only the
+    matching caller. When batch_fn raises BatchRejected the batch is
+    bisected and retried so only the offending items fail; any other
+    exception fails every caller of that batch.
+    """
+
+    def __init__(self, name: str,
+                 batch_fn: Callable[[list[Any]], Awaitable[list[Any]]],
+                 max_size: int, max_wait_ms: float):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_size = max_size
+        self.max_wait = max_wait_ms / 1000
+        self._pending: list[tuple[Any, asyncio.Future, float]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self._size_hist = histogram(f'batch_{name}_size', BATCH_SIZE_BUCKETS)
+        self._wait_hist = histogram(f'batch_{name}_wait_ms',
+                                    BATCH_WAIT_MS_BUCKETS)
+
+    async def submit(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        # Callers that gave up while waiting are not sent upstream.
+        batch = [entry for entry in self._pending if not entry[1].done()]
+        self._pending = []
+        if not batch:
+            return
+
+        now = time.perf_counter()
+        self._size_hist.observe(len(batch))
+        for _, _, enqueued in batch:
+            self._wait_hist.observe((now - enqueued) * 1000)
+
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _call(self, items: list[Any]) -> list[Any]:
+        try:
+            results = await self.batch_fn(items)
+        except BatchRejected as e:
+            if len(items) == 1:
+                return [e]
+            mid = len(items) // 2
+            left, right = await asyncio.gather(self._call(items[:mid]),
+                                               self._call(items[mid:]))
+            return left + right
+
+        if len(results) != len(items):
+            raise RuntimeError(
+                f"Batch {self.name} returned {len(results)} results "
+                f"for {len(items)} items"
+            )
+        return results
+
+    async def _run(self, batch: list[tuple[Any, asyncio.Future, float]]):
+        items = [item for item, _, _ in batch]
+        try:
+            results = await self._call(items)
+        except Exception as e:
+            log.error("Batch call failed", batch=self.name,
+                      size=len(items), error=str(e))
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,253 @@
+import time
+import uuid
+import asyncio
+import structlog
+
+from collections import OrderedDict
+from typing import Any
+from fastapi import HTTPException, status
+from sqlalchemy import delete, select, update, func
+
+from tevye_gpt_server.src.config.settings import settings
+from tevye_gpt_server.src.db.client import SessionLocal, use_primary
+from tevye_gpt_server.src.modules.conversations import (
+    Conversation,
+    ConversationMessage
+)
+from tevye_gpt_server.src.utils.metrics import counter
+
+log = structlog.get_logger(__name__='conversation store')
+
+# (role, content, other keys such as name or tool_calls)
+PackedMessage = tuple[str, Any, dict | None]
+
+
+def _pack(message: dict) -> PackedMessage:
+    extra = {k: v for k, v in message.items() if k not in ('role', 'content')}
+    return (message.get('role', 'user'), message.get('content'),
+            extra or None)
+
+
+def _unpack(packed: PackedMessage) -> dict:
+    role, content, extra = packed
+    message = {'role': role, 'content': content}
+    if extra:
+        message.update(extra)
+    return message
+
+
+def _size(packed: PackedMessage) -> int:
+    content = packed[1]
+    return len(content) if isinstance(content, str) else len(str(content))
+
+
+def _has_system(packed: list[PackedMessage]) -> bool:
+    return any(m[0] == 'system' for m in packed)
+
+
+def _merge(history: list[PackedMessage],
+           new: list[PackedMessage]) -> list[PackedMessage]:
+    # System messages in a new turn replace the stored ones, so a client
+    # re-sending its system prompt every turn does not grow the history.
+    if _has_system(new):
+        history = [m for m in history if m[0] != 'system']
+    return history + new
+
+
+class _Conversation():
+    __slots__ = ('id', 'owner_sub', 'tenant', 'messages', 'touched', 'lock')
+
+    def __init__(self, conversation_id: str, owner_sub: str, tenant: str,
+                 messages: list[PackedMessage]):
+        self.id = conversation_id
+        self.owner_sub = owner_sub
+        self.tenant = tenant
+        self.messages = messages
+        self.touched = time.monotonic()
+        self.lock = asyncio.Lock()
+
+
+class ConversationStore():
+    """
+    Conversation history kept server side so clients only send new turns.
+
+    Conversations live in an LRU/TTL in-memory tier and, when
+    CONVERSATION_PERSIST is set, are written through to Postgres and
+    reloaded from it on a cache miss. Ids are issued by create() and a
+    conversation belongs to the `sub` and tenant that created it. Unknown,
+    expired or evicted ids and other owners all get a 404, so a client
+    never silently continues with an empty history.
+
+    System messages are pinned ahead of the windowed turns; a turn that
+    carries system messages replaces the stored ones.
+    """
+
+    def __init__(self, max_entries: int, ttl_s: float, persist: bool):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.persist = persist
+        self._cache: OrderedDict[str, _Conversation] = OrderedDict()
+        self._hits = counter('conversation_cache_hits_total')
+        self._misses = counter('conversation_cache_misses_total')
+
+    def _cached(self, conversation_id: str) -> _Conversation | None:
+        conv = self._cache.get(conversation_id)
+        if conv is None:
+            return None
+        if time.monotonic() - conv.touched > self.ttl_s and \
+                not conv.lock.locked():
+            del self._cache[conversation_id]
+            return None
+        self._cache.move_to_end(conversation_id)
+        return conv
+
+    def _remember(self, conv: _Conversation):
+        self._cache[conv.id] = conv
+        self._cache.move_to_end(conv.id)
+        while len(self._cache) > self.max_entries:
+            _, oldest = next(iter(self._cache.items()))
+            if oldest.lock.locked():
+                break
+            self._cache.popitem(last=False)
+
+    async def create(self, owner_sub: str, tenant: str) -> str:
+        conv = _Conversation(uuid.uuid4().hex, owner_sub, tenant, [])
+        if self.persist:
+            await asyncio.to_thread(self._create_db, conv)
+        self._remember(conv)
+        return conv.id
+
+    async def load(self, conversation_id: str, owner_sub: str,
+                   tenant: str) -> _Conversation:
+        conv = self._cached(conversation_id)
+        if conv is not None:
+            self._hits.inc()
+        else:
+            self._misses.inc()
+            if self.persist:
+                conv = await asyncio.to_thread(self._load_db, conversation_id)
+            # Another request may have loaded it while we were waiting.
+            conv = self._cached(conversation_id) or conv
+            if conv is not None:
+                self._remember(conv)
+
+        if conv is None or conv.owner_sub != owner_sub or \
+                conv.tenant != tenant:
+            log.info("Conversation not found",
+                     conversation_id=conversation_id, sub=owner_sub)
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                detail="Conversation not found")
+        conv.touched = time.monotonic()
+        return conv
+
+    def context(self, conv: _Conversation,
+                new_messages: list[dict]) -> list[dict]:
+        """
+        Full upstream context: pinned system messages followed by the most
+        recent turns that fit CONVERSATION_MAX_MESSAGES and
+        CONVERSATION_MAX_CHARS. The new messages are always included.
+        """
+        history = _merge(conv.messages, [_pack(m) for m in new_messages])
+        system = [m for m in history if m[0] == 'system']
+        turns = [m for m in history if m[0] != 'system']
+
+        new_turns = sum(1 for m in new_messages if m.get('role') != 'system')
+
+        budget = settings.CONVERSATION_MAX_CHARS - sum(map(_size, system))
+        limit = settings.CONVERSATION_MAX_MESSAGES - len(system)
+        kept: list[PackedMessage] = []
+        for i, message in enumerate(reversed(turns)):
+            budget -= _size(message)
+            if i >= new_turns and (budget < 0 or len(kept) >= limit):
+                break
+            kept.append(message)
+        kept.reverse()
+        return [_unpack(m) for m in system + kept]
+
+    async def append(self, conv: _Conversation, messages: list[dict]):
+        packed = [_pack(m) for m in messages]
+        if self.persist:
+            await asyncio.to_thread(self._append_db, conv, packed)
+        conv.messages = _merge(conv.messages, packed)
+        self._trim(conv)
+
+    def _trim(self, conv: _Conversation):
+        # Only the window is needed in memory; Postgres keeps the full
+        # history when persistence is enabled.
+        overflow = len(conv.messages) - settings.CONVERSATION_MAX_MESSAGES
+        if overflow <= 0:
+            return
+        system = [m for m in conv.messages if m[0] == 'system']
+        turns = [m for m in conv.messages if m[0] != 'system']
+        keep = settings.CONVERSATION_MAX_MESSAGES - len(system)
+        conv.messages = system + (turns[-keep:] if keep > 0 else [])
+
+    def _create_db(self, conv: _Conversation):
+        with SessionLocal() as db:
+            use_primary(db)
+            db.add(Conversation(id=conv.id, owner_sub=conv.owner_sub,
+                                tenant=conv.tenant))
+            db.commit()
+
+    def _load_db(self, conversation_id: str) -> _Conversation | None:
+        with SessionLocal() as db:
+            use_primary(db)
+            row = db.get(Conversation, conversation_id)
+            if row is None:
+                return None
+
+            recent = (
+                select(ConversationMessage)
+                .where(ConversationMessage.conversation_id == conversation_id,
+                       ConversationMessage.role != 'system')
+                .order_by(ConversationMessage.id.desc())
+                .limit(settings.CONVERSATION_MAX_MESSAGES)
+            )
+            system = (
+                select(ConversationMessage)
+                .where(ConversationMessage.conversation_id == conversation_id,
+                       ConversationMessage.role == 'system')
+                .order_by(ConversationMessage.id)
+            )
+            messages = list(db.scalars(system)) + \
+                list(reversed(db.scalars(recent).all()))
+            return _Conversation(
+                row.id, row.owner_sub, row.tenant,
+                [(m.role, m.content, m.extra) for m in messages]
+            )
+
+    def _append_db(self, conv: _Conversation, packed: list[PackedMessage]):
+        with SessionLocal() as db:
+            use_primary(db)
+            # Ownership is enforced on the row itself, not only on what this
+            # worker has cached.
+            owned = db.execute(
+                update(Conversation)
+                .where(Conversation.id == conv.id,
+                       Conversation.owner_sub == conv.owner_sub,
+                       Conversation.tenant == conv.tenant)
+                .values(updated_at=func.now())
+            ).rowcount
+            if not owned:
+                db.rollback()
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                    detail="Conversation not found")
+            if _has_system(packed):
+                db.execute(
+                    delete(ConversationMessage)
+                    .where(ConversationMessage.conversation_id == conv.id,
+                           ConversationMessage.role == 'system')
+                )
+            db.add_all([
+                ConversationMessage(conversation_id=conv.id, role=role,
+                                    content=content, extra=extra)
+                for role, content, extra in packed
+            ])
+            db.commit()
+
+
+conversation_store = ConversationStore(
+    max_entries=settings.CONVERSATION_CACHE_SIZE,
+    ttl_s=settings.CONVERSATION_TTL_S,
+    persist=settings.CONVERSATION_PERSIST,
+)
@@ -0,0 +1,93 @@
+import math
+import asyncio
+import structlog
+
+from typing import Any, Awaitable
+from fastapi import HTTPException, Request, status
+
+from tevye_gpt_server.src.config.settings import settings
+from tevye_gpt_server.src.utils.metrics import counter
+
+log = structlog.get_logger(__name__='deadlines')
+
+HTTP_499_CLIENT_CLOSED_REQUEST = 499
+
+cancelled_total = counter('gateway_cancelled_total')
+deadline_exceeded_total = counter('gateway_deadline_exceeded_total')
+
+
+def deadline_from_request(request: Request) -> float | None:
+    """
+    Turn the client's remaining budget (in milliseconds) into an absolute
+    deadline on the event loop clock.
+    """
+    raw = request.headers.get(settings.DEADLINE_HEADER)
+    if raw is None:
+        return None
+    try:
+        budget_ms = float(raw)
+    except ValueError:
+        budget_ms = math.nan
+    if not math.isfinite(budget_ms) or budget_ms <= 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Invalid {settings.DEADLINE_HEADER} header")  # noqa: E501
+    return asyncio.get_running_loop().time() + budget_ms / 1000
+
+
+def remaining(deadline: float | None) -> float | None:
+    if deadline is None:
+        return None
+    return deadline - asyncio.get_running_loop().time()
+
+
+def ensure_budget(deadline: float | None):
+    budget = remaining(deadline)
+    if budget is not None and budget <= 0:
+        deadline_exceeded_total.inc()
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                            detail="Deadline exceeded")
+
+
+async def wait_for_disconnect(request: Request):
+    # The body has already been consumed, so the next message is the
+    # disconnect (either the client going away or the response finishing).
+    while True:
+        message = await request.receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+async def run_until_disconnect(request: Request, work: Awaitable[Any],
+                               deadline: float | None = None) -> Any:
+    """
+    Await `work`, cancelling it when the client disconnects or the deadline
+    passes. Callers should check ensure_budget() before building `work`.
+    """
+    work_task = asyncio.ensure_future(work)
+    disconnect_task = asyncio.ensure_future(wait_for_disconnect(request))
+    try:
+        done, _ = await asyncio.wait(
+            {work_task, disconnect_task},
+            timeout=remaining(deadline),
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+    finally:
+        disconnect_task.cancel()
+        if not work_task.done():
+            work_task.cancel()
+
+    if work_task in done:
+        return work_task.result()
+
+    if disconnect_task in done:
+        cancelled_total.inc()
+        log.info("Client disconnected, upstream request cancelled",
+                 url=str(request.url))
+        raise HTTPException(status_code=HTTP_499_CLIENT_CLOSED_REQUEST,
+                            detail="Client closed request")
+
+    deadline_exceeded_total.inc()
+    log.info("Deadline exceeded, upstream request cancelled",
+             url=str(request.url))
+    raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                        detail="Deadline exceeded")
@@ -0,0 +1,99 @@
+import bisect
+import threading
+
+
+class Counter():
+    def __init__(self, name: str):
+        self.name = name
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self) -> dict:
+        return {'type': 'counter', 'value': self.value}
+
+
+class Gauge():
+    def __init__(self, name: str):
+        self.name = name
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def snapshot(self) -> dict:
+        return {'type': 'gauge', 'value': self.value}
+
+
+class LabeledGauge():
+    """
+    One gauge per label value; a label is dropped once its value is zero so
+    the series set stays bounded by what is currently non-zero.
+    """
+
+    def __init__(self, name: str, label: str):
+        self.name = name
+        self.label = label
+        self.values: dict[str, float] = {}
+
+    def set(self, label_value: str, value: float):
+        if value:
+            self.values[label_value] = value
+        else:
+            self.values.pop(label_value, None)
+
+    def snapshot(self) -> dict:
+        return {'type': 'gauge', 'label': self.label,
+                'values': dict(self.values)}
+
+
+class Histogram():
+    def __init__(self, name: str, buckets: list[float]):
+        self.name = name
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[idx] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self) -> dict:
+        bounds = [str(b) for b in self.buckets] + ['+Inf']
+        return {
+            'type': 'histogram',
+            'count': self.count,
+            'sum': self.sum,
+            'buckets': dict(zip(bounds, self.counts)),
+        }
+
+
+METRICS: dict[str, Counter | Gauge | LabeledGauge | Histogram] = {}
+
+
+def counter(name: str) -> Counter:
+    return METRICS.setdefault(name, Counter(name))
+
+
+def gauge(name: str) -> Gauge:
+    return METRICS.setdefault(name, Gauge(name))
+
+
+def labeled_gauge(name: str, label: str) -> LabeledGauge:
+    return METRICS.setdefault(name, LabeledGauge(name, label))
+
+
+def histogram(name: str, buckets: list[float]) -> Histogram:
+    return METRICS.setdefault(name, Histogram(name, buckets))
+
+
+def snapshot() -> dict:
+    return {name: metric.snapshot() for name, metric in METRICS.items()}
@@ -0,0 +1,249 @@
+import os
+import asyncio
+import json
+import time
+import uuid
+import pstats
+import random
+import cProfile
+import functools
+import threading
+import structlog
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from jose import JWTError
+
+from tevye_gpt_server.src.config.settings import settings
+from tevye_gpt_server.src.modules.auth import RoleEnum
+from tevye_gpt_server.src.utils.app_security import decode_access_token
+
+log = structlog.get_logger(__name__='profiling')
+
+_current_profile: ContextVar['RequestProfile | None'] = ContextVar(
+    'current_profile', default=None
+)
+_profiler_lock = threading.Lock()
+
+
+class RequestProfile():
+    """
+    Span timings and (optionally) a cProfile capture for a single request.
+    """
+
+    def __init__(self, method: str, path: str, reason: str):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.reason = reason
+        self.spans: list[tuple[str, float]] = []
+        self.started = time.perf_counter()
+        self.profiler: cProfile.Profile | None = None
+
+    def add_span(self, name: str, elapsed: float):
+        self.spans.append((name, elapsed))
+
+    @contextmanager
+    def capture(self):
+        """
+        Run cProfile around a block executed on the current thread.
+
+        On Python 3.12+ cProfile hooks sys.monitoring, which is process
+        wide, so calls from other threads can show up in the capture.
+        """
+        # Only one cProfile can be active per interpreter; concurrent
+        # profiled requests fall back to span timings only.
+        if self.profiler is not None or \
+                not _profiler_lock.acquire(blocking=False):
+            yield
+            return
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+        try:
+            yield
+        finally:
+            self.profiler.disable()
+            _profiler_lock.release()
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        entries = [f"{name};dur={elapsed * 1000:.2f}"
+                   for name, elapsed in self.spans]
+        entries.append(f"total;dur={self.elapsed() * 1000:.2f}")
+        return ', '.join(entries)
+
+    def dump(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        summary = {
+            'id': self.id,
+            'method': self.method,
+            'path': self.path,
+            'reason': self.reason,
+            'total_ms': round(self.elapsed() * 1000, 3),
+            'spans': [{'name': name, 'ms': round(elapsed * 1000, 3)}
+                      for name, elapsed in self.spans],
+        }
+        if self.profiler is not None:
+            prof_path = os.path.join(directory, f"{self.id}.prof")
+            self.profiler.dump_stats(prof_path)
+            summary['profile'] = prof_path
+            stats = pstats.Stats(self.profiler).sort_stats('cumulative')
+            summary['top'] = [
+                {'function': pstats.func_std_string(func),
+                 'calls': nc, 'cumulative_ms': round(ct * 1000, 3)}
+                for func, (_, nc, _, ct, _) in sorted(
+                    stats.stats.items(), key=lambda i: i[1][3], reverse=True
+                )[:25]
+            ]
+        with open(os.path.join(directory, f"{self.id}.json"), 'w') as fh:
+            json.dump(summary, fh, indent=2)
+
+
+def _prune(directory: str, max_files: int):
+    """
+    Keep only the newest `max_files` profiles (a .json summary and its
+    optional .prof dump) in `directory`.
+    """
+    summaries = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith('.json'):
+                try:
+                    summaries.append((entry.stat().st_mtime, entry.name))
+                except FileNotFoundError:
+                    continue
+    if len(summaries) <= max_files:
+        return
+    summaries.sort()
+    for _, name in summaries[:len(summaries) - max_files]:
+        stem = name.removesuffix('.json')
+        for suffix in ('.json', '.prof'):
+            try:
+                os.remove(os.path.join(directory, stem + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def _write_profile(profile: RequestProfile):
+    profile.dump(settings.PROFILING_DIR)
+    _prune(settings.PROFILING_DIR, settings.PROFILING_MAX_FILES)
+
+
+@contextmanager
+def span(name: str):
+    """
+    Record the duration of a named stage on the current request profile.
+    Does nothing when the request is not being profiled.
+    """
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_span(name, time.perf_counter() - start)
+
+
+def profiled(endpoint):
+    """
+    Decorator for sync endpoints: runs cProfile inside the threadpool
+    worker executing the endpoint, so the capture holds this request's
+    work (password hashing, ORM flushes) and nothing else.
+    """
+    if not settings.PROFILING_ENABLED:
+        return endpoint
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        profile = _current_profile.get()
+        if profile is None:
+            return endpoint(*args, **kwargs)
+        with profile.capture():
+            return endpoint(*args, **kwargs)
+
+    return wrapper
+
+
+def _header(scope, name: bytes) -> str | None:
+    for key, value in scope.get('headers', []):
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+def _is_admin(scope) -> bool:
+    auth = _header(scope, b'authorization') or ''
+    if not auth.startswith('Bearer '):
+        return False
+    try:
+        claims = decode_access_token(auth.removeprefix('Bearer ').strip())
+    except (JWTError, ValueError):
+        return False
+    return RoleEnum.admin.value in (claims.get('roles') or [])
+
+
+def _profile_reason(scope) -> str | None:
+    trigger = settings.PROFILING_HEADER.lower().encode('latin-1')
+    if _header(scope, trigger) is not None and _is_admin(scope):
+        return 'admin'
+    if scope.get('path') in settings.PROFILING_SKIP_PATHS:
+        return None
+    if settings.PROFILING_SAMPLE_RATE > 0 and \
+            random.random() < settings.PROFILING_SAMPLE_RATE:
+        return 'sampled'
+    return None
+
+
+class ProfilingMiddleware():
+    """
+    ASGI middleware profiling requests triggered by an admin token carrying
+    the profiling header, or picked by PROFILING_SAMPLE_RATE.
+
+    Span timings and, for endpoints decorated with `profiled`, a cProfile
+    dump are written to PROFILING_DIR, which keeps the newest
+    PROFILING_MAX_FILES profiles. Health routes (PROFILING_SKIP_PATHS) are
+    never sampled. Only admin-triggered profiles get the Server-Timing and
+    X-Profile-Id headers back: span names reveal which code path ran (e.g.
+    whether a login email exists).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        reason = _profile_reason(scope) if scope['type'] == 'http' else None
+        if reason is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope.get('method', ''),
+                                 scope.get('path', ''), reason)
+
+        async def send_with_timing(message):
+            if message['type'] == 'http.response.start':
+                headers = list(message.get('headers', []))
+                headers.append((b'server-timing',
+                                profile.server_timing().encode('latin-1')))
+                headers.append((b'x-profile-id',
+                                profile.id.encode('latin-1')))
+                message = {**message, 'headers': headers}
+            await send(message)
+
+        token = _current_profile.set(profile)
+        try:
+            await self.app(scope, receive,
+                           send_with_timing if reason == 'admin' else send)
+        finally:
+            _current_profile.reset(token)
+            try:
+                await asyncio.to_thread(_write_profile, profile)
+            except OSError as e:
+                log.error("Could not write request profile", error=str(e))
+            log.info("Request profiled", profile_id=profile.id,
+                     path=profile.path, reason=reason,
+                     total_ms=round(profile.elapsed() * 1000, 3))
@@ -0,0 +1,150 @@
+import heapq
+import asyncio
+import itertools
+import structlog
+
+from fastapi import HTTPException, status
+
+from tevye_gpt_server.src.config.settings import settings
+from tevye_gpt_server.src.interfaces.gateway import Priority
+from tevye_gpt_server.src.utils.metrics import (
+    counter,
+    gauge,
+    histogram,
+    labeled_gauge
+)
+
+log = structlog.get_logger(__name__='scheduler')
+
+QUEUE_WAIT_MS_BUCKETS = [1, 5, 10, 50, 100, 500, 1000, 5000, 10000]
+
+
+class _Waiter():
+    __slots__ = ('flow', 'future', 'enqueued')
+
+    def __init__(self, flow: tuple[str, Priority], future: asyncio.Future,
+                 enqueued: float):
+        self.flow = flow
+        self.future = future
+        self.enqueued = enqueued
+
+
+class FairScheduler():
+    """
+    Self-clocked weighted fair queuing in front of upstream dispatch.
+
+    Every (tenant, priority) pair is a flow. A queued request gets the
+    virtual finish tag max(V, last finish of its flow) + 1 / weight and
+    requests are released in tag order from a heap whenever a slot under
+    max_in_flight frees up, so enqueue and release are O(log n). The weight
+    is the tenant weight times the priority class weight, which keeps batch
+    traffic moving while letting interactive traffic through first.
+    """
+
+    def __init__(self, max_in_flight: int, max_queue_ms: float,
+                 tenant_weights: dict[str, float],
+                 priority_weights: dict[Priority, float]):
+        self.max_in_flight = max_in_flight
+        self.max_queue_time = max_queue_ms / 1000
+        self.tenant_weights = tenant_weights
+        self.priority_weights = priority_weights
+        self._in_flight = 0
+        self._virtual_time = 0.0
+        self._last_finish: dict[tuple[str, Priority], float] = {}
+        self._heap: list[tuple[float, int, _Waiter]] = []
+        self._seq = itertools.count()
+        self._depth: dict[str, int] = {}
+        self._in_flight_gauge = gauge('scheduler_in_flight')
+        self._depth_gauge = labeled_gauge('scheduler_queue_depth', 'tenant')
+        self._wait_hist = histogram('scheduler_queue_wait_ms',
+                                    QUEUE_WAIT_MS_BUCKETS)
+        self._timeouts = counter('scheduler_queue_timeout_total')
+
+    def _weight(self, tenant: str, priority: Priority) -> float:
+        return self.tenant_weights.get(tenant, 1.0) * \
+            self.priority_weights.get(priority, 1.0)
+
+    def _set_depth(self, tenant: str, delta: int):
+        depth = self._depth.get(tenant, 0) + delta
+        if depth:
+            self._depth[tenant] = depth
+        else:
+            self._depth.pop(tenant, None)
+        self._depth_gauge.set(tenant, depth)
+
+    def _set_in_flight(self, delta: int):
+        self._in_flight += delta
+        self._in_flight_gauge.set(self._in_flight)
+
+    async def acquire(self, tenant: str, priority: Priority):
+        if self._in_flight < self.max_in_flight and not self._heap:
+            self._set_in_flight(1)
+            return
+
+        loop = asyncio.get_running_loop()
+        flow = (tenant, priority)
+        start = max(self._virtual_time, self._last_finish.get(flow, 0.0))
+        finish = start + 1 / self._weight(tenant, priority)
+        self._last_finish[flow] = finish
+
+        waiter = _Waiter(flow, loop.create_future(), loop.time())
+        heapq.heappush(self._heap, (finish, next(self._seq), waiter))
+        self._set_depth(tenant, 1)
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(waiter.future, self.max_queue_time)
+        except asyncio.TimeoutError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # On 3.12+ wait_for can time out in the same loop iteration
+                # that _dispatch granted the slot; keep it.
+                return
+            self._set_depth(tenant, -1)
+            self._timeouts.inc()
+            log.info("Queue time limit exceeded", tenant=tenant,
+                     priority=priority.value)
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,  # noqa: E501
+                                detail="Upstream capacity saturated")
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # The slot was handed over just as the caller went away.
+                self.release()
+            else:
+                waiter.future.cancel()
+                self._set_depth(tenant, -1)
+            raise
+
+    def release(self):
+        self._set_in_flight(-1)
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._heap and self._in_flight < self.max_in_flight:
+            finish, _, waiter = heapq.heappop(self._heap)
+            if not waiter.future.done():
+                self._virtual_time = finish
+            # A flow whose last tag is behind the virtual clock schedules
+            # exactly like an unseen one, so its entry can go.
+            if self._last_finish.get(waiter.flow, finish) <= \
+                    self._virtual_time:
+                self._last_finish.pop(waiter.flow, None)
+            # Timed out and cancelled waiters are dropped lazily.
+            if waiter.future.done():
+                continue
+            self._set_in_flight(1)
+            self._set_depth(waiter.flow[0], -1)
+            self._wait_hist.observe(
+                (asyncio.get_running_loop().time() - waiter.enqueued) * 1000
+            )
+            waiter.future.set_result(None)
+
+
+scheduler = FairScheduler(
+    max_in_flight=settings.SCHEDULER_MAX_IN_FLIGHT,
+    max_queue_ms=settings.SCHEDULER_MAX_QUEUE_MS,
+    tenant_weights=settings.SCHEDULER_TENANT_WEIGHTS,
+    priority_weights={
+        Priority.interactive: settings.SCHEDULER_INTERACTIVE_WEIGHT,
+        Priority.batch: settings.SCHEDULER_BATCH_WEIGHT,
+    },
+)
@@ -1,7 +1,8 @@
 from tevye_gpt_server.src.modules.services import (
-    ServiceHandler, ChatCompletion
+    ServiceHandler, ChatCompletion, Embeddings
     )
 
 SERVICE_REGISTRY: dict[str, ServiceHandler] = {
-    'chat_completion': ChatCompletion()
+    'chat_completion': ChatCompletion(),
+    'embeddings': Embeddings()
 }
@@ -0,0 +1,78 @@
+import json
+import queue
+import time
+import random
+import threading
+import structlog
+
+from tevye_gpt_server.src.config.settings import settings
+from tevye_gpt_server.src.utils.metrics import counter
+
+log = structlog.get_logger(__name__='traffic recorder')
+
+# Values under these keys describe the shape of a call, not its content.
+_KEEP_KEYS = {'role', 'model', 'stream', 'max_tokens', 'temperature', 'n'}
+
+
+def _sanitize(value, key: str | None = None):
+    if isinstance(value, dict):
+        return {k: _sanitize(v, k) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_sanitize(v, key) for v in value]
+    if isinstance(value, str) and key not in _KEEP_KEYS:
+        return 'x' * len(value)
+    return value
+
+
+class TrafficRecorder():
+    """
+    Append sanitized gateway calls to a JSONL file for later replay by the
+    benchmark suite. Strings are replaced by same-length placeholders so
+    payload sizes and shapes survive while their content does not.
+    """
+
+    def __init__(self, path: str, sample_rate: float):
+        self.path = path
+        self.sample_rate = sample_rate
+        self._started = time.monotonic()
+        self._queue: queue.Queue[str] = queue.Queue(maxsize=10000)
+        self._dropped = counter('traffic_recorder_dropped_total')
+        # Writes happen on a daemon thread so recording never blocks the
+        # event loop and skews the latencies being captured.
+        self._writer = threading.Thread(target=self._write_loop,
+                                        name='traffic-recorder', daemon=True)
+        self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            lines = [self._queue.get()]
+            while not self._queue.empty() and len(lines) < 1000:
+                lines.append(self._queue.get_nowait())
+            try:
+                with open(self.path, 'a') as fh:
+                    fh.write(''.join(lines))
+            except OSError as e:
+                log.error("Could not record traffic", error=str(e))
+
+    def record(self, service: str, priority: str, payload: dict,
+               status_code: int, latency_ms: float):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return
+
+        line = json.dumps({
+            'offset_s': round(time.monotonic() - self._started, 6),
+            'service': service,
+            'priority': priority,
+            'payload': _sanitize(payload),
+            'status': status_code,
+            'latency_ms': round(latency_ms, 3),
+        })
+        try:
+            self._queue.put_nowait(line + '\n')
+        except queue.Full:
+            self._dropped.inc()
+
+
+recorder = TrafficRecorder(settings.TRAFFIC_RECORD_PATH,
+                           settings.TRAFFIC_RECORD_SAMPLE_RATE) \
+    if settings.TRAFFIC_RECORD_PATH else None